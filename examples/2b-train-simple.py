@@ -45,6 +45,7 @@ def main():
         max_epochs=2,
         accelerator="gpu",
         devices=1,
+        precision="bf16-mixed" if torch.cuda.is_bf16_supported() else "16-mixed",
         logger=logger,
         callbacks=callbacks,
     )
@@ -56,7 +57,8 @@ def main():
     # note: modify this to load your own data instead!
     td_init = env.reset(batch_size=[16]).to(device)
     policy = model.policy.to(device)
-    out = policy(td_init.clone(), env, phase="test", decode_type="greedy")
+    with torch.inference_mode():
+        out = policy(td_init.clone(), env, phase="test", decode_type="greedy")
 
     # Print results
     print(f"Tour lengths: {[f'{-r.item():.3f}' for r in out['reward']]}")
@@ -1,5 +1,9 @@
-from functools import partial
-from multiprocessing import Pool
+import atexit
+import math
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache, partial
 from typing import Tuple
 
 import numpy as np
@@ -62,18 +66,29 @@ def local_search(
 
     # Convert tensors to numpy arrays
     # Note: to avoid the overhead of device transfer, we recommend to pass the tensors in cpu
-    actions_np = actions.detach().cpu().numpy()
-    positions_np = td["locs"].detach().cpu().numpy()  # [batch_size, num_loc + 1, 2]
-    demands_np = td["demand"].detach().cpu().numpy()  # [batch_size, num_loc]
-    demands_np = np.pad(demands_np, ((0, 0), (1, 0)), mode="constant")  # Add depot demand
     distances = td.get("distances", None)  # [batch_size, num_loc + 1, num_loc + 1]
     if distances is None:
-        distances_np = get_distance_matrix(td["locs"]).numpy()
-    else:
-        distances_np = distances.detach().cpu().numpy()
+        # Computed on the device of the locations, then transferred with the other tensors
+        distances = get_distance_matrix(td["locs"])
+    actions_np, positions_np, demands_np, distances_np = _to_numpy(
+        actions,
+        td["locs"],  # [batch_size, num_loc + 1, 2]
+        td["demand"],  # [batch_size, num_loc]
+        distances,
+    )
+    demands_np = np.pad(demands_np, ((0, 0), (1, 0)), mode="constant")  # Add depot demand
+
+    # Scale to integers once for the whole batch, as required by PyVRP
+    positions_np = (positions_np * C).astype(np.int64)
+    demands_np = np.round(demands_np * C).astype(np.int64)
+    distances_np = (distances_np * C).astype(np.int64)
 
     max_trials = 1 if allow_infeasible_solution else max_trials
 
+    # The neighbourhood configuration is shared by all instances, so we build it only once
+    if not isinstance(neighbourhood_params, NeighbourhoodParams):
+        neighbourhood_params = NeighbourhoodParams(**(neighbourhood_params or {}))
+
     partial_func = partial(
         local_search_single,
         neighbourhood_params=neighbourhood_params,
@@ -84,28 +99,75 @@ def local_search(
     )
 
     if num_workers > 1:
-        with Pool(processes=num_workers) as pool:
-            new_actions = pool.starmap(
-                partial_func, zip(actions_np, positions_np, demands_np, distances_np)
-            )
+        chunksize = math.ceil(len(actions_np) / (4 * num_workers))
+        new_actions = _parallel_map(
+            num_workers,
+            partial_func,
+            actions_np,
+            positions_np,
+            demands_np,
+            distances_np,
+            chunksize=chunksize,
+        )
     else:
         new_actions = [
             partial_func(*args)
             for args in zip(actions_np, positions_np, demands_np, distances_np)
         ]
 
-    # padding with zero
-    lengths = [len(act) for act in new_actions]
-    max_length = max(lengths)
-    new_actions = np.array(
-        [
-            np.pad(act, (0, max_length - length), mode="constant")
-            for act, length in zip(new_actions, lengths)
-        ]
-    )
-    return torch.from_numpy(new_actions[:, :-1].astype(np.int64)).to(
-        td.device
-    )  # We can remove the last zero
+    # Write the tours into a single zero-padded buffer. We can remove the last zero
+    max_length = max(len(act) for act in new_actions) - 1
+    new_actions_np = np.zeros((len(new_actions), max_length), dtype=np.int64)
+    for act, row in zip(new_actions, new_actions_np):
+        row[: len(act)] = act[:max_length]
+    return torch.from_numpy(new_actions_np).to(td.device)
+
+
+def _to_numpy(*tensors: torch.Tensor) -> list[np.ndarray]:
+    """Copy tensors to host memory as NumPy arrays. Device-to-host copies are issued
+    asynchronously and synchronized once, instead of blocking on each tensor in turn."""
+    host_tensors = [t.detach().to("cpu", non_blocking=True) for t in tensors]
+    if any(t.is_cuda for t in tensors):
+        torch.cuda.synchronize()
+    return [t.numpy() for t in host_tensors]
+
+
+# Worker processes are kept alive and reused across calls, since spawning a new pool
+# every time costs more than the local search itself for small batches
+_executors: dict[int, ProcessPoolExecutor] = {}
+
+
+def _get_executor(num_workers: int) -> ProcessPoolExecutor:
+    if num_workers not in _executors:
+        _executors[num_workers] = ProcessPoolExecutor(max_workers=num_workers)
+    return _executors[num_workers]
+
+
+def _drop_executor(num_workers: int):
+    executor = _executors.pop(num_workers, None)
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+@atexit.register
+def _shutdown_executors():
+    for num_workers in list(_executors):
+        _drop_executor(num_workers)
+
+
+def _parallel_map(num_workers: int, func, *iterables, chunksize: int = 1) -> list:
+    """Map `func` over the iterables with the shared worker pool. If a worker died and
+    broke the pool, the pool is rebuilt and the map is retried once."""
+    try:
+        return list(_get_executor(num_workers).map(func, *iterables, chunksize=chunksize))
+    except BrokenProcessPool:
+        log.warning("Local search worker pool is broken, restarting it")
+        _drop_executor(num_workers)
+    try:
+        return list(_get_executor(num_workers).map(func, *iterables, chunksize=chunksize))
+    except BrokenProcessPool:
+        _drop_executor(num_workers)
+        raise
 
 
 def local_search_single(
@@ -113,12 +175,19 @@ def local_search_single(
     positions: np.ndarray,
     demands: np.ndarray,
     distances: np.ndarray,
-    neighbourhood_params: dict | None = None,
+    neighbourhood_params: NeighbourhoodParams | dict | None = None,
     allow_infeasible_solution: bool = False,
     load_penalty: float = 0.2,
     max_trials: int = 10,
     seed: int = 0,
 ) -> np.ndarray:
+    """Improve a single tour with PyVRP local search.
+
+    Note:
+        `positions`, `demands` (with the depot entry first) and `distances` must already be
+        scaled to integers by `C`, as done in :func:`local_search`. Float inputs are
+        rejected rather than rescaled.
+    """
     data = make_data(positions, demands, distances)
     solution = make_solution(data, path)
     ls_operator = make_search_operator(data, seed, neighbourhood_params)
@@ -126,7 +195,7 @@ def local_search_single(
     improved_solution, is_feasible = perform_local_search(
         ls_operator,
         solution,
-        int(load_penalty * C),  # * C as we scale the data in `make_data`
+        int(load_penalty * C),  # * C as the data is scaled in `local_search`
         remaining_trials=max_trials,
     )
 
@@ -134,56 +203,87 @@ def local_search_single(
     if not is_feasible and not allow_infeasible_solution:
         return path
 
-    # Recover the path from the sub-routes in the solution
-    route_list = [
-        idx for route in improved_solution.routes() for idx in [0] + route.visits()
-    ] + [0]
-    return np.array(route_list)
+    # Recover the path from the sub-routes in the solution, with a depot visit before each
+    # sub-route and at the end, by copying the sub-routes into a single zero buffer
+    visits = [route.visits() for route in improved_solution.routes()]
+    starts = np.cumsum([1] + [len(route) + 1 for route in visits])
+    new_path = np.zeros(starts[-1], dtype=np.int64)
+    for start, route in zip(starts.tolist(), visits):
+        new_path[start : start + len(route)] = route
+    return new_path
 
 
 def make_data(
     positions: np.ndarray, demands: np.ndarray, distances: np.ndarray
 ) -> ProblemData:
-    positions = (positions * C).astype(int)
-    distances = (distances * C).astype(int)
-
+    """Build the PyVRP problem data from positions, demands and distances already scaled
+    to integers by `C` (see :func:`local_search`)."""
+    for name, array in (
+        ("positions", positions),
+        ("demands", demands),
+        ("distances", distances),
+    ):
+        assert np.issubdtype(
+            array.dtype, np.integer
+        ), f"{name} must be scaled to integers by C, got dtype {array.dtype}"
     capacity = C
-    demands = np.round(demands * capacity).astype(int)
+
+    # Convert to Python ints in one go to avoid per-argument NumPy scalar conversion
+    xs, ys = positions.T.tolist()
+    delivery = demands.tolist()
 
     return ProblemData(
         clients=[
-            Client(x=pos[0], y=pos[1], delivery=d)
-            for pos, d in zip(positions[1:], demands[1:])
+            Client(x=x, y=y, delivery=d) for x, y, d in zip(xs[1:], ys[1:], delivery[1:])
         ],
-        depots=[Depot(x=positions[0][0], y=positions[0][1])],
+        depots=[Depot(x=xs[0], y=ys[0])],
         vehicle_types=[
             VehicleType(
                 len(positions) - 1,
                 capacity,
                 0,
-                name=",".join(map(str, range(1, len(positions)))),
+                name=_vehicle_type_name(len(positions) - 1),
             )
         ],
         distance_matrices=[distances],
-        duration_matrices=[np.zeros_like(distances)],
+        duration_matrices=[_zero_matrix(len(distances))],
     )
 
 
+@lru_cache
+def _vehicle_type_name(num_clients: int) -> str:
+    # Same for every instance of a batch, so there is no need to rebuild the string each time
+    return ",".join(map(str, range(1, num_clients + 1)))
+
+
+@lru_cache
+def _zero_matrix(size: int) -> np.ndarray:
+    # Durations are unused, so a single read-only zero matrix is shared by all instances
+    matrix = np.zeros((size, size), dtype=np.int64)
+    matrix.setflags(write=False)
+    return matrix
+
+
 def make_solution(data: ProblemData, path: np.ndarray) -> Solution:
-    # Split the paths into sub-routes by the zeros
-    routes = [
-        arr[1:].tolist() for arr in np.split(path, np.where(path == 0)[0]) if len(arr) > 1
-    ]
+    # Split the paths into sub-routes by the zeros, dropping the leading element of each
+    # segment and the empty sub-routes
+    bounds = np.concatenate(([0], np.flatnonzero(path == 0), [len(path)]))
+    starts, ends = bounds[:-1] + 1, bounds[1:]
+    keep = ends > starts
+    path = path.tolist()
+    routes = [path[s:e] for s, e in zip(starts[keep].tolist(), ends[keep].tolist())]
     return Solution(data, routes)
 
 
 def make_search_operator(
-    data: ProblemData, seed=0, neighbourhood_params: dict | None = None
+    data: ProblemData,
+    seed=0,
+    neighbourhood_params: NeighbourhoodParams | dict | None = None,
 ) -> LocalSearch:
     rng = RandomNumberGenerator(seed)
-    neighbours = compute_neighbours(
-        data, NeighbourhoodParams(**(neighbourhood_params or {}))
-    )
+    if not isinstance(neighbourhood_params, NeighbourhoodParams):
+        neighbourhood_params = NeighbourhoodParams(**(neighbourhood_params or {}))
+    neighbours = compute_neighbours(data, neighbourhood_params)
     ls = LocalSearch(data, rng, neighbours)
     for node_op in NODE_OPERATORS:
         ls.add_node_operator(node_op(data))
@@ -192,16 +292,19 @@ def make_search_operator(
     return ls
 
 
+@lru_cache
+def _cost_evaluator(load_penalty: int) -> CostEvaluator:
+    # Evaluators are immutable, so we build one per penalty and reuse it across calls
+    return CostEvaluator(load_penalty=load_penalty, tw_penalty=0, dist_penalty=0)
+
+
 def perform_local_search(
     ls_operator: LocalSearch,
     solution: Solution,
     load_penalty: int,
     remaining_trials: int = 5,
 ) -> Tuple[Solution, bool]:
-    cost_evaluator = CostEvaluator(
-        load_penalty=load_penalty, tw_penalty=0, dist_penalty=0
-    )
-    improved_solution = ls_operator(solution, cost_evaluator)
+    improved_solution = ls_operator(solution, _cost_evaluator(load_penalty))
     remaining_trials -= 1
     if is_feasible := improved_solution.is_feasible() or remaining_trials == 0:
         return improved_solution, is_feasible
@@ -1,3 +1,4 @@
+from functools import lru_cache
 from typing import Optional
 
 import torch
@@ -13,6 +14,79 @@ from .generator import MTSPGenerator
 from .render import render
 
 
+def _update_lengths(
+    cur_loc: torch.Tensor,
+    prev_loc: torch.Tensor,
+    depot_loc: torch.Tensor,
+    current_length: torch.Tensor,
+    max_subtour_length: torch.Tensor,
+    done: torch.Tensor,
+):
+    """Purely elementwise distance and length update of :func:`_step_fn`, which is fused
+    into a single kernel when the step is compiled.
+    """
+    current_length = current_length + get_distance(cur_loc, prev_loc)
+
+    # If done, we add the distance from the current_node to the depot as well
+    current_length = torch.where(
+        done, current_length + get_distance(cur_loc, depot_loc), current_length
+    )
+    return current_length, torch.maximum(current_length, max_subtour_length)
+
+
+def _step_fn(
+    current_node: torch.Tensor,
+    prev_node: torch.Tensor,
+    locs: torch.Tensor,
+    agent_idx: torch.Tensor,
+    num_agents: torch.Tensor,
+    action_mask: torch.Tensor,
+    current_length: torch.Tensor,
+    max_subtour_length: torch.Tensor,
+):
+    """Tensor-only part of :meth:`MTSPEnv._step`, kept free of TensorDict and Python
+    control flow so that it can be compiled into a single graph with `torch.compile`.
+    """
+    # Get the locations of the current node and the previous node with a single gather, and the depot
+    cur_loc, prev_loc = gather_by_index(
+        locs, torch.stack([current_node, prev_node], dim=-1)
+    ).unbind(-2)
+    depot_loc = locs[..., 0, :]
+
+    # If current_node is the depot, then increment agent_idx
+    cur_agent_idx = agent_idx + (current_node == 0).long()
+
+    # Set not visited to 0 (i.e., we visited the node)
+    available = action_mask.scatter(-1, current_node[..., None].expand_as(action_mask), 0)
+
+    # We are done there are no unvisited locations except the depot
+    done = ~available[..., 1:].any(dim=-1)
+
+    # Available[..., 0] is the depot, which is always available unless:
+    # - current_node is the depot
+    # - agent_idx greater than num_agents -1
+    # If done is True, then we make the depot available again, so that it will be selected as the next node with prob 1
+    available[..., 0] = ((current_node != 0) & (agent_idx < num_agents - 1)) | done
+
+    # Update the current length and the max_subtour_length
+    current_length, max_subtour_length = _update_lengths(
+        cur_loc, prev_loc, depot_loc, current_length, max_subtour_length, done
+    )
+
+    # If current agent is different from previous agent, then we have a new subtour and reset the length
+    current_length.masked_fill_(cur_agent_idx != agent_idx, 0)
+
+    return available, done, current_length, max_subtour_length, cur_agent_idx
+
+
+@lru_cache
+def _get_step_fn(compile_step: bool):
+    """Return :func:`_step_fn`, compiled on first use if requested. The compiled function
+    is kept here rather than on the env, so that the env stays picklable.
+    """
+    return torch.compile(_step_fn) if compile_step else _step_fn
+
+
 class MTSPEnv(RL4COEnvBase):
     """Multiple Traveling Salesman Problem environment
     At each step, an agent chooses to visit a city. A maximum of `num_agents` agents can be employed to visit the cities.
@@ -43,6 +117,8 @@ class MTSPEnv(RL4COEnvBase):
         cost_type: type of cost to use, either `minmax` or `sum`
         generator: MTSPGenerator instance as the data generator
         generator_params: parameters for the generator
+        compile_step: whether to compile the tensor operations of the step with `torch.compile`
+            to fuse them into fewer kernels. Defaults to False
     """
 
     name = "mtsp"
@@ -52,6 +128,7 @@ class MTSPEnv(RL4COEnvBase):
         generator: MTSPGenerator = None,
         generator_params: dict = {},
         cost_type: str = "minmax",
+        compile_step: bool = False,
         **kwargs,
     ):
         super().__init__(**kwargs)
@@ -59,60 +136,27 @@ class MTSPEnv(RL4COEnvBase):
             generator = MTSPGenerator(**generator_params)
         self.generator = generator
         self.cost_type = cost_type
+        self.compile_step = compile_step
         self._make_spec(self.generator)
 
-    @staticmethod
-    def _step(td: TensorDict) -> TensorDict:
+    def _step(self, td: TensorDict) -> TensorDict:
         # Initial variables
         is_first_action = batch_to_scalar(td["i"]) == 0
         current_node = td["action"]
         first_node = current_node if is_first_action else td["first_node"]
 
-        # Get the locations of the current node and the previous node and the depot
-        cur_loc = gather_by_index(td["locs"], current_node)
-        prev_loc = gather_by_index(
-            td["locs"], td["current_node"]
-        )  # current_node is the previous node
-        depot_loc = td["locs"][..., 0, :]
-
-        # If current_node is the depot, then increment agent_idx
-        cur_agent_idx = td["agent_idx"] + (current_node == 0).long()
-
-        # Set not visited to 0 (i.e., we visited the node)
-        available = td["action_mask"].scatter(
-            -1, current_node[..., None].expand_as(td["action_mask"]), 0
-        )
-        # Available[..., 0] is the depot, which is always available unless:
-        # - current_node is the depot
-        # - agent_idx greater than num_agents -1
-        available[..., 0] = torch.logical_and(
-            current_node != 0, td["agent_idx"] < td["num_agents"] - 1
-        )
-
-        # We are done there are no unvisited locations except the depot
-        done = torch.count_nonzero(available[..., 1:], dim=-1) == 0
-
-        # If done is True, then we make the depot available again, so that it will be selected as the next node with prob 1
-        available[..., 0] = torch.logical_or(done, available[..., 0])
-
-        # Update the current length
-        current_length = td["current_length"] + get_distance(cur_loc, prev_loc)
-
-        # If done, we add the distance from the current_node to the depot as well
-        current_length = torch.where(
-            done, current_length + get_distance(cur_loc, depot_loc), current_length
-        )
-
-        # We update the max_subtour_length and reset the current_length
-        max_subtour_length = torch.where(
-            current_length > td["max_subtour_length"],
-            current_length,
+        step_fn = _get_step_fn(self.compile_step)
+        available, done, current_length, max_subtour_length, cur_agent_idx = step_fn(
+            current_node,
+            td["current_node"],  # current_node is the previous node
+            td["locs"],
+            td["agent_idx"],
+            td["num_agents"],
+            td["action_mask"],
+            td["current_length"],
             td["max_subtour_length"],
         )
 
-        # If current agent is different from previous agent, then we have a new subtour and reset the length
-        current_length *= (cur_agent_idx == td["agent_idx"]).float()
-
         # The reward is the negative of the max_subtour_length (minmax objective)
         reward = -max_subtour_length
 
@@ -135,20 +179,22 @@ class MTSPEnv(RL4COEnvBase):
     def _reset(self, td: Optional[TensorDict] = None, batch_size=None) -> TensorDict:
         device = td.device
 
-        # Keep track of the agent number to know when to stop
-        agent_idx = torch.zeros((*batch_size,), dtype=torch.int64, device=device)
+        # Integer variables share a single allocation (each one is a contiguous view):
+        # the agent number to know when to stop, the current node and the step counter
+        agent_idx, current_node, i = torch.zeros(
+            (3, *batch_size), dtype=torch.int64, device=device
+        )
 
-        # Make variable for max_subtour_length between subtours
-        max_subtour_length = torch.zeros(batch_size, dtype=torch.float32, device=device)
-        current_length = torch.zeros(batch_size, dtype=torch.float32, device=device)
+        # Make variable for max_subtour_length between subtours, with a single allocation as well
+        max_subtour_length, current_length = torch.zeros(
+            (2, *batch_size), dtype=torch.float32, device=device
+        )
 
         # Other variables
-        current_node = torch.zeros((*batch_size,), dtype=torch.int64, device=device)
         available = torch.ones(
             (*batch_size, self.generator.num_loc), dtype=torch.bool, device=device
         )  # 1 means not visited, i.e. action is allowed
         available[..., 0] = 0  # Depot is not available as first node
-        i = torch.zeros((*batch_size,), dtype=torch.int64, device=device)
 
         return TensorDict(
             {
@@ -224,8 +270,7 @@ class MTSPEnv(RL4COEnvBase):
 
         # With distance, same as TSP
         elif self.cost_type == "sum":
-            locs = td["locs"]
-            locs_ordered = locs.gather(1, actions.unsqueeze(-1).expand_as(locs))
+            locs_ordered = gather_by_index(td["locs"], actions)
             return -get_tour_length(locs_ordered)
 
         else:
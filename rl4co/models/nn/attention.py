@@ -2,6 +2,7 @@ import itertools
 import math
 import warnings
 
+from functools import lru_cache
 from typing import Callable, Optional
 
 import torch
@@ -16,6 +17,22 @@ from rl4co.utils import get_pylogger
 log = get_pylogger(__name__)
 
 
+@lru_cache(maxsize=16)
+def _causal_mask(s: int, l_: int, device: torch.device) -> torch.Tensor:
+    """Boolean mask of shape (s, l_) that is True above the diagonal, cached per shape and device"""
+    return torch.ones((s, l_), dtype=torch.bool, device=device).triu_(diagonal=1)
+
+
+def bool_to_additive_mask(mask: torch.Tensor, dtype: torch.dtype) -> torch.Tensor:
+    """Convert a boolean attention mask (True = attend) into an additive float mask with 0 for
+    attended positions and -inf elsewhere. Converting once and reusing the result across layers
+    avoids the per-call boolean-to-float conversion done inside `scaled_dot_product_attention`.
+    """
+    return torch.zeros(mask.shape, dtype=dtype, device=mask.device).masked_fill_(
+        ~mask, float("-inf")
+    )
+
+
 def scaled_dot_product_attention_simple(
     q, k, v, attn_mask=None, dropout_p=0.0, is_causal=False
 ):
@@ -25,8 +42,20 @@ def scaled_dot_product_attention_simple(
     if is_causal and attn_mask is not None:
         raise ValueError("Cannot set both is_causal and attn_mask")
 
-    # Calculate scaled dot product
-    scores = torch.matmul(q, k.transpose(-2, -1)) / (k.size(-1) ** 0.5)
+    # Calculate scaled dot product, folding the scale into the GEMM when batch dims match
+    scale = k.size(-1) ** -0.5
+    if q.shape[:-2] == k.shape[:-2]:
+        *batch_dims, q_len, _ = q.shape
+        scores = torch.baddbmm(
+            q.new_empty(()),
+            q.reshape(-1, q_len, q.size(-1)),
+            k.reshape(-1, k.size(-2), k.size(-1)).transpose(-2, -1),
+            beta=0,
+            alpha=scale,
+        ).view(*batch_dims, q_len, k.size(-2))
+    else:
+        # scale the query rather than the (larger) scores or the broadcast key
+        scores = torch.matmul(q * scale, k.transpose(-2, -1))
 
     # Apply the provided attention mask
     if attn_mask is not None:
@@ -37,9 +66,8 @@ def scaled_dot_product_attention_simple(
 
     # Apply causal mask
     if is_causal:
-        s, l_ = scores.size(-2), scores.size(-1)
-        mask = torch.triu(torch.ones((s, l_), device=scores.device), diagonal=1)
-        scores.masked_fill_(mask.bool(), float("-inf"))
+        mask = _causal_mask(scores.size(-2), scores.size(-1), scores.device)
+        scores.masked_fill_(mask, float("-inf"))
 
     # Softmax to get attention weights
     attn_weights = F.softmax(scores, dim=-1)
@@ -69,6 +97,8 @@ class MultiHeadAttention(nn.Module):
 
     Note:
         If `scaled_dot_product_attention` is not available, use custom implementation of `scaled_dot_product_attention` without Flash Attention.
+        Head dimensions that are not a multiple of 8 are zero-padded internally, with the softmax scale
+        unchanged. This applies to self-attention only: `MultiHeadCrossAttention` still requires it.
 
     Args:
         embed_dim: total dimension of the model
@@ -102,21 +132,28 @@ class MultiHeadAttention(nn.Module):
         self.num_heads = num_heads
         assert self.embed_dim % num_heads == 0, "self.kdim must be divisible by num_heads"
         self.head_dim = self.embed_dim // num_heads
-        assert (
-            self.head_dim % 8 == 0 and self.head_dim <= 128
-        ), "Only support head_dim <= 128 and divisible by 8"
+        assert self.head_dim <= 128, "Only support head_dim <= 128"
+        # Heads are zero-padded to a multiple of 8 so that SDPA can use its fused kernels.
+        # The query is rescaled so that the softmax scale still uses the true head_dim
+        self.head_pad = -self.head_dim % 8
+        self.q_pad_scale = math.sqrt((self.head_dim + self.head_pad) / self.head_dim)
 
         self.Wqkv = nn.Linear(embed_dim, 3 * embed_dim, bias=bias, **factory_kwargs)
         self.out_proj = nn.Linear(embed_dim, embed_dim, bias=bias, **factory_kwargs)
 
     def forward(self, x, attn_mask=None):
         """x: (batch, seqlen, hidden_dim) (where hidden_dim = num heads * head dim)
-        attn_mask: bool tensor of shape (batch, seqlen)
+        attn_mask: bool tensor of shape (batch, seqlen), or an equivalent additive float mask
+            (see `bool_to_additive_mask`)
         """
-        # Project query, key, value
-        q, k, v = rearrange(
-            self.Wqkv(x), "b s (three h d) -> three b h s d", three=3, h=self.num_heads
-        ).unbind(dim=0)
+        # Project query, key, value and split heads with a single view into [3, b, h, s, d]
+        b, s, _ = x.shape
+        q, k, v = (
+            self.Wqkv(x)
+            .view(b, s, 3, self.num_heads, self.head_dim)
+            .permute(2, 0, 3, 1, 4)
+            .unbind(dim=0)
+        )
 
         if attn_mask is not None:
             attn_mask = (
@@ -125,6 +162,11 @@ class MultiHeadAttention(nn.Module):
                 else attn_mask.unsqueeze(1).unsqueeze(2)
             )
 
+        if self.head_pad:
+            q = F.pad(q * self.q_pad_scale, (0, self.head_pad))
+            k = F.pad(k, (0, self.head_pad))
+            v = F.pad(v, (0, self.head_pad))
+
         # Scaled dot product attention
         out = self.sdpa_fn(
             q,
@@ -133,7 +175,9 @@ class MultiHeadAttention(nn.Module):
             attn_mask=attn_mask,
             dropout_p=self.attention_dropout,
         )
-        return self.out_proj(rearrange(out, "b h s d -> b s (h d)"))
+        if self.head_pad:
+            out = out[..., : self.head_dim]
+        return self.out_proj(out.transpose(1, 2).reshape(b, s, self.embed_dim))
 
 
 def sdpa_fn_wrapper(q, k, v, attn_mask=None, dmat=None, dropout_p=0.0, is_causal=False):
@@ -161,6 +205,8 @@ class MultiHeadCrossAttention(nn.Module):
         device: torch device
         dtype: torch dtype
         sdpa_fn: scaled dot product attention function (SDPA)
+        num_kv_heads: number of key/value heads shared by groups of query heads (grouped-query
+            attention). Must divide `num_heads`. Defaults to `num_heads` (standard multi-head attention)
     """
 
     def __init__(
@@ -172,6 +218,7 @@ class MultiHeadCrossAttention(nn.Module):
         device: str = None,
         dtype: torch.dtype = None,
         sdpa_fn: Optional[Callable | nn.Module] = None,
+        num_kv_heads: Optional[int] = None,
     ) -> None:
         factory_kwargs = {"device": device, "dtype": dtype}
         super().__init__()
@@ -190,20 +237,35 @@ class MultiHeadCrossAttention(nn.Module):
             self.head_dim % 8 == 0 and self.head_dim <= 128
         ), "Only support head_dim <= 128 and divisible by 8"
 
+        self.num_kv_heads = num_kv_heads if num_kv_heads is not None else num_heads
+        assert (
+            num_heads % self.num_kv_heads == 0
+        ), "num_heads must be divisible by num_kv_heads"
+
         self.Wq = nn.Linear(embed_dim, embed_dim, bias=bias, **factory_kwargs)
-        self.Wkv = nn.Linear(embed_dim, 2 * embed_dim, bias=bias, **factory_kwargs)
+        self.Wkv = nn.Linear(
+            embed_dim, 2 * self.num_kv_heads * self.head_dim, bias=bias, **factory_kwargs
+        )
         self.out_proj = nn.Linear(embed_dim, embed_dim, bias=bias, **factory_kwargs)
 
     def forward(self, q_input, kv_input, cross_attn_mask=None, dmat=None):
-        # Project query, key, value
-        q = rearrange(
-            self.Wq(q_input), "b m (h d) -> b h m d", h=self.num_heads
+        # Project query, key, value and split heads with single views
+        b, m, _ = q_input.shape
+        b_kv, n, _ = kv_input.shape
+        q = (
+            self.Wq(q_input).view(b, m, self.num_heads, self.head_dim).transpose(1, 2)
         )  # [b, h, m, d]
-        k, v = rearrange(
-            self.Wkv(kv_input), "b n (two h d) -> two b h n d", two=2, h=self.num_heads
-        ).unbind(
-            dim=0
-        )  # [b, h, n, d]
+        k, v = (
+            self.Wkv(kv_input)
+            .view(b_kv, n, 2, self.num_kv_heads, self.head_dim)
+            .permute(2, 0, 3, 1, 4)
+            .unbind(dim=0)
+        )  # [b, h_kv, n, d]
+        if self.num_kv_heads != self.num_heads:
+            # share each key/value head across its group of query heads
+            groups = self.num_heads // self.num_kv_heads
+            k = k.repeat_interleave(groups, dim=1)
+            v = v.repeat_interleave(groups, dim=1)  # [b, h, n, d]
 
         if cross_attn_mask is not None:
             # add head dim
@@ -218,7 +280,7 @@ class MultiHeadCrossAttention(nn.Module):
             dmat=dmat,
             dropout_p=self.attention_dropout,
         )
-        return self.out_proj(rearrange(out, "b h s d -> b s (h d)"))
+        return self.out_proj(out.transpose(1, 2).reshape(b, m, self.embed_dim))
 
 
 class PointerAttention(nn.Module):
@@ -238,7 +300,7 @@ class PointerAttention(nn.Module):
         num_heads: number of heads
         mask_inner: whether to mask inner attention
         linear_bias: whether to use bias in linear projection
-        check_nan: whether to check for NaNs in logits
+        check_nan: whether to check for NaNs in logits (for debugging, syncs with the host at every step)
         sdpa_fn: scaled dot product attention function (SDPA) implementation
     """
 
@@ -248,7 +310,7 @@ class PointerAttention(nn.Module):
         num_heads: int,
         mask_inner: bool = True,
         out_bias: bool = False,
-        check_nan: bool = True,
+        check_nan: bool = False,
         sdpa_fn: Callable | str = "default",
         **kwargs,
     ):
@@ -259,6 +321,8 @@ class PointerAttention(nn.Module):
         # Projection - query, key, value already include projections
         self.project_out = nn.Linear(embed_dim, embed_dim, bias=out_bias)
         self.check_nan = check_nan
+        # logit scaling, glimpse has embed_dim
+        self.norm_factor = 1 / math.sqrt(embed_dim)
 
         # Defaults for sdpa_fn implementation
         # see https://github.com/ai4co/rl4co/issues/228
@@ -295,10 +359,15 @@ class PointerAttention(nn.Module):
         glimpse = self._project_out(heads, attn_mask)
 
         # Batch matrix multiplication to compute logits (batch_size, num_steps, graph_size)
-        # bmm is slightly faster than einsum and matmul
-        logits = (torch.bmm(glimpse, logit_key.squeeze(-2).transpose(-2, -1))).squeeze(
-            -2
-        ) / math.sqrt(glimpse.size(-1))
+        # bmm is slightly faster than einsum and matmul; baddbmm also applies the scaling
+        # as the GEMM's alpha instead of in a separate pass
+        logits = torch.baddbmm(
+            glimpse.new_empty(()),
+            glimpse,
+            logit_key.squeeze(-2).transpose(-2, -1),
+            beta=0,
+            alpha=self.norm_factor,
+        ).squeeze(-2)
 
         if self.check_nan:
             assert not torch.isnan(logits).any(), "Logits contain NaNs"
@@ -346,7 +415,7 @@ class PointerAttnMoE(PointerAttention):
         num_heads: number of heads
         mask_inner: whether to mask inner attention
         linear_bias: whether to use bias in linear projection
-        check_nan: whether to check for NaNs in logits
+        check_nan: whether to check for NaNs in logits (for debugging, syncs with the host at every step)
         sdpa_fn: scaled dot product attention function (SDPA) implementation
         moe_kwargs: Keyword arguments for MoE
     """
@@ -357,7 +426,7 @@ class PointerAttnMoE(PointerAttention):
         num_heads: int,
         mask_inner: bool = True,
         out_bias: bool = False,
-        check_nan: bool = True,
+        check_nan: bool = False,
         sdpa_fn: Optional[Callable] = None,
         moe_kwargs: Optional[dict] = None,
     ):
@@ -495,7 +564,7 @@ class PolyNetAttention(PointerAttention):
         num_heads: number of heads
         mask_inner: whether to mask inner attention
         linear_bias: whether to use bias in linear projection
-        check_nan: whether to check for NaNs in logits
+        check_nan: whether to check for NaNs in logits (for debugging, syncs with the host at every step)
         sdpa_fn: scaled dot product attention function (SDPA) implementation
     """
 
@@ -545,10 +614,15 @@ class PolyNetAttention(PointerAttention):
         glimpse += poly_out
 
         # Batch matrix multiplication to compute logits (batch_size, num_steps, graph_size)
-        # bmm is slightly faster than einsum and matmul
-        logits = (torch.bmm(glimpse, logit_key.squeeze(-2).transpose(-2, -1))).squeeze(
-            -2
-        ) / math.sqrt(glimpse.size(-1))
+        # bmm is slightly faster than einsum and matmul; baddbmm also applies the scaling
+        # as the GEMM's alpha instead of in a separate pass
+        logits = torch.baddbmm(
+            glimpse.new_empty(()),
+            glimpse,
+            logit_key.squeeze(-2).transpose(-2, -1),
+            beta=0,
+            alpha=self.norm_factor,
+        ).squeeze(-2)
 
         if self.check_nan:
             assert not torch.isnan(logits).any(), "Logits contain NaNs"
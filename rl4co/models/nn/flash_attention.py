@@ -1,15 +1,39 @@
+from functools import lru_cache
+
 import torch
 
-try:
-    # from fla.ops.linear_attn.chunk_fuse import fused_chunk_linear_attn
-    from fla.ops.linear_attn.chunk import chunk_linear_attn as fused_chunk_linear_attn
-except ImportError:
-    fused_chunk_linear_attn = None
+from rl4co.utils import get_pylogger
+
+log = get_pylogger(__name__)
+
+
+# Optional kernels are imported lazily on first use, so that importing this module
+# does not pay for (or initialize CUDA through) packages that may never be called
+@lru_cache(maxsize=None)
+def _get_fused_chunk_linear_attn():
+    try:
+        # from fla.ops.linear_attn.chunk_fuse import fused_chunk_linear_attn
+        from fla.ops.linear_attn.chunk import chunk_linear_attn as fused_chunk_linear_attn
+    except ImportError:
+        fused_chunk_linear_attn = None
+    return fused_chunk_linear_attn
 
-try:
-    from flash_attn import flash_attn_func
-except ImportError:
-    flash_attn_func = None
+
+@lru_cache(maxsize=None)
+def _get_flash_attn_func():
+    try:
+        from flash_attn import flash_attn_func
+    except ImportError:
+        flash_attn_func = None
+    return flash_attn_func
+
+
+@lru_cache(maxsize=None)
+def _warn_bfloat16_cast(dtype: torch.dtype):
+    log.warning(
+        f"Flash Attention only supports half precision: {dtype} inputs are cast to "
+        "bfloat16 for the kernel call and the output is cast back"
+    )
 
 
 def fused_chunk_linear_attn_wrapper(
@@ -22,6 +46,7 @@ def fused_chunk_linear_attn_wrapper(
     normalize: bool = True,
     **kwargs,
 ):
+    fused_chunk_linear_attn = _get_fused_chunk_linear_attn()
     assert (
         fused_chunk_linear_attn is not None
     ), "fused_chunk_linear_attn not found. Install Flash Linear Attention using instructions from https://github.com/sustcsonglin/flash-linear-attention"
@@ -44,6 +69,9 @@ def scaled_dot_product_attention_flash_attn(
 
     Note:
         Flash Attention does not support masking except for causal masking.
+        Inputs that are not in half precision are cast to bfloat16 for the kernel call (Flash Attention 2
+        requires Ampere or newer, which supports bfloat16) and the output is cast back to the input dtype.
+        A warning is logged the first time this happens.
 
     Args:
         q (torch.Tensor): Query tensor of shape `(batch_size, num_heads, seq_len_q, head_dim)`
@@ -54,11 +82,16 @@ def scaled_dot_product_attention_flash_attn(
         is_causal (bool): Whether to apply causal mask to attention scores
     """
     assert attn_mask is None, "`attn_mask` is not supported in Flash Attention"
+    flash_attn_func = _get_flash_attn_func()
     assert flash_attn_func is not None, (
         "Flash Attention not found. Install Flash Attention using instructions from "
         "https://github.com/Dao-AILab/flash-attention . "
         "Alternatively, use `torch.nn.functional.scaled_dot_product_attention` available from PyTorch 2.0.0"
     )
+    dtype = q.dtype
+    if dtype not in (torch.float16, torch.bfloat16):
+        _warn_bfloat16_cast(dtype)
+        q, k, v = q.bfloat16(), k.bfloat16(), v.bfloat16()
     q, k, v = q.transpose(-2, -3), k.transpose(-2, -3), v.transpose(-2, -3)
     out = flash_attn_func(q, k, v, dropout_p=dropout_p, causal=is_causal)
-    return out.transpose(-2, -3)
+    return out.transpose(-2, -3).to(dtype)
@@ -60,7 +60,7 @@ class AttentionModelDecoder(AutoregressiveDecoder):
         out_bias_pointer_attn: Whether to use a bias in the pointer attention
         linear_bias: Whether to use a bias in the linear layer
         use_graph_context: Whether to use the graph context
-        check_nan: Whether to check for nan values during decoding
+        check_nan: Whether to check for nan values during decoding (for debugging, syncs with the host at every step)
         sdpa_fn: scaled_dot_product_attention function
         pointer: Module implementing the pointer logic (defaults to PointerAttention)
         moe_kwargs: Keyword arguments for MoE
@@ -77,7 +77,7 @@ class AttentionModelDecoder(AutoregressiveDecoder):
         out_bias_pointer_attn: bool = False,
         linear_bias: bool = False,
         use_graph_context: bool = True,
-        check_nan: bool = True,
+        check_nan: bool = False,
         sdpa_fn: callable = None,
         pointer: nn.Module = None,
         moe_kwargs: dict = None,
@@ -150,6 +150,10 @@ class AttentionModelDecoder(AutoregressiveDecoder):
             cached.glimpse_val,
             cached.logit_key,
         )
+        # Static keys are fixed for the whole episode, so reuse them without per-step copies
+        if not self.is_dynamic_embedding:
+            return glimpse_k_stat, glimpse_v_stat, logit_k_stat
+
         # Compute dynamic embeddings and add to static embeddings
         glimpse_k_dyn, glimpse_v_dyn, logit_k_dyn = self.dynamic_embedding(td)
         glimpse_k = glimpse_k_stat + glimpse_k_dyn
@@ -35,7 +35,7 @@ class AttentionModelPolicy(AutoregressivePolicy):
         sdpa_fn: (deprecated) Function to use for the scaled dot product attention
         mask_inner: Whether to mask the inner product
         out_bias_pointer_attn: Whether to use a bias in the pointer attention
-        check_nan: Whether to check for nan values during decoding
+        check_nan: Whether to check for nan values during decoding (for debugging, syncs with the host at every step)
         temperature: Temperature for the softmax
         tanh_clipping: Tanh clipping value (see Bello et al., 2016)
         mask_logits: Whether to mask the logits during decoding
@@ -68,7 +68,7 @@ class AttentionModelPolicy(AutoregressivePolicy):
         sdpa_fn_decoder: Callable = None,
         mask_inner: bool = True,
         out_bias_pointer_attn: bool = False,
-        check_nan: bool = True,
+        check_nan: bool = False,
         temperature: float = 1.0,
         tanh_clipping: float = 10.0,
         mask_logits: bool = True,
@@ -76,7 +76,7 @@ class JSSPActor(L2DActor):
         hidden_dim: int,
         hidden_layers: int = 2,
         het_emb: bool = False,
-        check_nan: bool = True,
+        check_nan: bool = False,
     ) -> None:
         super().__init__()
 
@@ -128,7 +128,7 @@ class FJSPActor(L2DActor):
         embed_dim: int,
         hidden_dim: int,
         hidden_layers: int = 2,
-        check_nan: bool = True,
+        check_nan: bool = False,
     ) -> None:
         super().__init__()
         self.mlp = MLP(
@@ -246,7 +246,7 @@ class L2DAttnPointer(PointerAttention):
         embed_dim: int,
         num_heads: int,
         out_bias: bool = False,
-        check_nan: bool = True,
+        check_nan: bool = False,
     ):
         super().__init__(
             embed_dim=embed_dim,
@@ -284,7 +284,7 @@ class AttnActor(AttentionModelDecoder):
         out_bias_pointer_attn: bool = False,
         linear_bias: bool = False,
         use_graph_context: bool = True,
-        check_nan: bool = True,
+        check_nan: bool = False,
         sdpa_fn: callable = None,
         pointer: nn.Module = None,
         moe_kwargs: dict = None,
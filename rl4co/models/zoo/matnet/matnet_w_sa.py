@@ -6,7 +6,7 @@ import torch.nn.functional as F
 
 from einops import rearrange
 
-from rl4co.models.nn.attention import MultiHeadAttention
+from rl4co.models.nn.attention import MultiHeadAttention, bool_to_additive_mask
 from rl4co.models.nn.env_embeddings import env_init_embedding
 from rl4co.models.nn.ops import Normalization, TransformerFFN
 
@@ -183,8 +183,9 @@ class Encoder(nn.Module):
         # [BS, num_machines, emb], [BS, num_operations, emb]
         ops_embed, ma_embed, edge_feat = self.init_embedding(td)
         try:
-            # mask padded ops; shape=(bs, ops)
-            ops_attn_mask = ~td["pad_mask"]
+            # mask padded ops; shape=(bs, ops). Converted once to an additive mask
+            # so that it is not re-converted by SDPA in every layer
+            ops_attn_mask = bool_to_additive_mask(~td["pad_mask"], ops_embed.dtype)
         except KeyError:
             ops_attn_mask = None
         # padded ops should also be masked in cross attention; shape=(bs, ops, ma)
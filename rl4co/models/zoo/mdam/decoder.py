@@ -9,7 +9,7 @@ import torch.nn.functional as F
 from tensordict import TensorDict
 
 from rl4co.envs import RL4COEnvBase
-from rl4co.models.nn.attention import PointerAttention
+from rl4co.models.nn.attention import PointerAttention, scaled_dot_product_attention
 from rl4co.models.nn.env_embeddings import env_context_embedding, env_dynamic_embedding
 from rl4co.utils.decoding import decode_logprobs, get_log_likelihood
 
@@ -291,18 +291,16 @@ class MDAMDecoder(nn.Module):
             batch_size, num_steps, self.num_heads, 1, key_size
         ).permute(2, 0, 1, 3, 4)
 
-        # Batch matrix multiplication to compute compatibilities (n_heads, batch_size, num_steps, graph_size)
-        compatibility = torch.matmul(glimpse_Q, glimpse_K.transpose(-2, -1)) / math.sqrt(
-            glimpse_Q.size(-1)
-        )
+        # Compute heads (n_heads, batch_size, num_steps, 1, val_size) with fused attention
+        # so that the (n_heads, batch_size, num_steps, 1, graph_size) scores are not kept
         if self.mask_inner:
             assert self.mask_logits, "Cannot mask inner without masking logits"
-            compatibility[~mask[None, :, None, None, :].expand_as(compatibility)] = (
-                -math.inf
-            )
-
-        # Batch matrix multiplication to compute heads (n_heads, batch_size, num_steps, val_size)
-        heads = torch.matmul(F.softmax(compatibility, dim=-1), glimpse_V)
+        heads = scaled_dot_product_attention(
+            glimpse_Q,
+            glimpse_K,
+            glimpse_V,
+            attn_mask=mask[None, :, None, None, :] if self.mask_inner else None,
+        )
 
         # Project to get glimpse/updated context node embedding (batch_size, num_steps, embed_dim)
         glimpse = self.project_out[path_index](
@@ -325,6 +323,6 @@ class MDAMDecoder(nn.Module):
         if self.tanh_clipping > 0:
             logits = F.tanh(logits) * self.tanh_clipping
         if self.mask_logits:
-            logits[~mask[:, None, :]] = -math.inf
+            logits.masked_fill_(~mask[:, None, :], -math.inf)
 
         return logits, glimpse.squeeze(-2)
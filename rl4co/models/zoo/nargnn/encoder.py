@@ -61,20 +61,22 @@ class EdgeHeatmapGenerator(nn.Module):
         return heatmap_logits
 
     def _make_heatmap_logits(self, batch_graph: Batch) -> Tensor:  # type: ignore
-        graphs = batch_graph.to_data_list()
-        device = graphs[0].edge_attr.device
-        batch_size = len(graphs)
-        num_nodes = graphs[0].x.shape[0]
+        edge_index, edge_attr = batch_graph.edge_index, batch_graph.edge_attr
+        batch_size = batch_graph.num_graphs
+        num_nodes = batch_graph.num_nodes // batch_size
 
         heatmap = torch.zeros(
             (batch_size, num_nodes, num_nodes),
-            device=device,
-            dtype=graphs[0].edge_attr.dtype,
+            device=edge_attr.device,
+            dtype=edge_attr.dtype,
         )
 
-        for index, graph in enumerate(graphs):
-            edge_index, edge_attr = graph.edge_index, graph.edge_attr
-            heatmap[index, edge_index[0], edge_index[1]] = edge_attr.flatten()
+        # Scatter all edges at once: map each edge to its graph and to graph-local node indices
+        graph_index = batch_graph.batch[edge_index[0]]
+        local_edge_index = edge_index - batch_graph.ptr[graph_index]
+        heatmap[graph_index, local_edge_index[0], local_edge_index[1]] = (
+            edge_attr.flatten()
+        )
 
         # This is commented out, because it undo the some of the sparsification.
         # if self.undirected_graph:
@@ -82,7 +84,8 @@ class EdgeHeatmapGenerator(nn.Module):
 
         heatmap += 1e-10 if heatmap.dtype != torch.float16 else 3e-8
         # 3e-8 is the smallest positive number such that log(3e-8) is not -inf
-        heatmap_logits = torch.log(heatmap)
+        # Take the log in place (reusing the dense buffer) unless autograd needs the input
+        heatmap_logits = torch.log(heatmap) if heatmap.requires_grad else heatmap.log_()
 
         return heatmap_logits
 
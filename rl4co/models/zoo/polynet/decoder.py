@@ -45,7 +45,7 @@ class PolyNetDecoder(AttentionModelDecoder):
         out_bias_pointer_attn: Whether to use a bias in the pointer attention
         linear_bias: Whether to use a bias in the linear layer
         use_graph_context: Whether to use the graph context
-        check_nan: Whether to check for nan values during decoding
+        check_nan: Whether to check for nan values during decoding (for debugging, syncs with the host at every step)
         sdpa_fn: scaled_dot_product_attention function
     """
 
@@ -63,7 +63,7 @@ class PolyNetDecoder(AttentionModelDecoder):
         out_bias_pointer_attn: bool = False,
         linear_bias: bool = False,
         use_graph_context: bool = True,
-        check_nan: bool = True,
+        check_nan: bool = False,
         sdpa_fn: callable = None,
         **unused_kwargs,
     ):
@@ -88,7 +88,7 @@ class Decoder(nn.Module):
         log_p = torch.log_softmax(logits, dim=1)
 
         if not self.mask_logits:
-            log_p[~logit_mask] = float("-inf")
+            log_p.masked_fill_(~logit_mask, float("-inf"))
 
         return h_out, log_p, logit_mask
 
@@ -108,7 +108,7 @@ class Decoder(nn.Module):
             ref, logits = self.glimpse(g_l, context)
             # For the glimpses, only mask before softmax so we have always an L1 norm 1 readout vector
             if mask_glimpses:
-                logits[~logit_mask] = float("-inf")
+                logits.masked_fill_(~logit_mask, float("-inf"))
             # [batch_size x h_dim x sourceL] * [batch_size x sourceL x 1] =
             # [batch_size x h_dim x 1]
             g_l = torch.bmm(ref, F.softmax(logits, dim=1).unsqueeze(2)).squeeze(2)
@@ -116,7 +116,7 @@ class Decoder(nn.Module):
 
         # Masking before softmax makes probs sum to one
         if mask_logits:
-            logits[~logit_mask] = float("-inf")
+            logits.masked_fill_(~logit_mask, float("-inf"))
 
         return logits, h_out
 
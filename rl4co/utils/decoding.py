@@ -167,16 +167,17 @@ def process_logits(
         mask_logits: Whether to mask logits of infeasible actions.
     """
 
-    # Tanh clipping from Bello et al. 2016
+    # Tanh clipping from Bello et al. 2016, folded with temperature scaling into one multiply
     if tanh_clipping > 0:
-        logits = torch.tanh(logits) * tanh_clipping
+        logits = torch.tanh(logits) * (tanh_clipping / temperature)
+    else:
+        logits = logits / temperature  # temperature scaling
 
-    # In RL, we want to mask the logits to prevent the agent from selecting infeasible actions
+    # In RL, we want to mask the logits to prevent the agent from selecting infeasible actions.
+    # Masking in place on the freshly scaled tensor avoids boolean indexing and an extra copy
     if mask_logits:
         assert mask is not None, "mask must be provided if mask_logits is True"
-        logits[~mask] = float("-inf")
-
-    logits = logits / temperature  # temperature scaling
+        logits.masked_fill_(~mask, float("-inf"))
 
     if top_k > 0:
         top_k = min(top_k, logits.size(-1))  # safety check
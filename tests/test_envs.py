@@ -1,6 +1,9 @@
+import os
+import signal
 import warnings
 
 import matplotlib.pyplot as plt
+import numpy as np
 import pytest
 import torch
 
@@ -59,6 +62,32 @@ def test_routing(env_cls, batch_size=2, size=20):
     assert reward.shape == (batch_size,)
 
 
+@pytest.mark.parametrize("cost_type", ["minmax", "sum"])
+def test_mtsp_cost_type(cost_type, batch_size=2, size=20):
+    env = MTSPEnv(generator_params=dict(num_loc=size), cost_type=cost_type)
+    reward, td, actions = rollout(env, env.reset(batch_size=[batch_size]), random_policy)
+    assert reward.shape == (batch_size,)
+
+
+def test_mtsp_compile_step(batch_size=2, size=20):
+    import pickle
+
+    env = MTSPEnv(generator_params=dict(num_loc=size))
+    # the env must stay picklable with compile_step, e.g. for spawn-based DDP
+    compiled_env = pickle.loads(
+        pickle.dumps(MTSPEnv(generator_params=dict(num_loc=size), compile_step=True))
+    )
+    td = env.reset(batch_size=[batch_size])
+    torch.manual_seed(0)
+    reward, _, actions = rollout(env, td.clone(), random_policy)
+    torch.manual_seed(0)
+    compiled_reward, _, compiled_actions = rollout(
+        compiled_env, td.clone(), random_policy
+    )
+    assert torch.equal(actions, compiled_actions)
+    assert torch.allclose(reward, compiled_reward)
+
+
 @pytest.mark.parametrize(
     "variant",
     [
@@ -86,6 +115,40 @@ def test_mtvrp(variant, batch_size=2, size=20):
     assert reward.shape == (batch_size,)
 
 
+def test_cvrp_local_search_single_rejects_floats(size=5):
+    from rl4co.envs.routing.cvrp.local_search import local_search_single
+
+    # unscaled float inputs would be silently truncated to zero by PyVRP
+    path = np.array([0, 1, 2, 0, 3, 4, 5, 0])
+    positions = np.random.rand(size + 1, 2)
+    demands = np.random.rand(size + 1) / size
+    distances = np.linalg.norm(positions[:, None] - positions[None], axis=-1)
+    with pytest.raises(AssertionError):
+        local_search_single(path, positions, demands, distances)
+
+
+def test_cvrp_local_search_workers(batch_size=4, size=20):
+    from rl4co.envs.routing.cvrp import local_search as ls
+
+    torch.manual_seed(0)
+    env = CVRPEnv(generator_params=dict(num_loc=size))
+    td = env.reset(batch_size=[batch_size])
+    reward, _, actions = rollout(env, td.clone(), random_policy)
+    expected = env.local_search(td, actions)
+    env.check_solution_validity(td, expected)
+    assert (env.get_reward(td, expected) >= reward - 1e-6).all()
+
+    # the second call reuses the worker pool created by the first one
+    for _ in range(2):
+        assert torch.equal(env.local_search(td, actions, num_workers=2), expected)
+    executor = ls._executors[2]
+
+    # a pool broken by a dead worker is rebuilt on the next call
+    os.kill(next(iter(executor._processes)), signal.SIGKILL)
+    assert torch.equal(env.local_search(td, actions, num_workers=2), expected)
+    assert ls._executors[2] is not executor
+
+
 @pytest.mark.parametrize("env_cls", [DPPEnv, MDPPEnv])
 def test_eda(env_cls, batch_size=2, max_decaps=5):
     env = env_cls(max_decaps=max_decaps)
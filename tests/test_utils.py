@@ -4,7 +4,11 @@ import torch
 from tensordict import TensorDict
 from torch.nn.functional import scaled_dot_product_attention
 
-from rl4co.models.nn.attention import scaled_dot_product_attention_simple
+from rl4co.models.nn.attention import (
+    MultiHeadAttention,
+    MultiHeadCrossAttention,
+    scaled_dot_product_attention_simple,
+)
 from rl4co.utils.decoding import process_logits
 from rl4co.utils.ops import batchify, unbatchify
 
@@ -50,3 +54,67 @@ def test_scaled_dot_product_attention():
     attn_torch = scaled_dot_product_attention(q, k, v, attn_mask)
     attn_rl4co = scaled_dot_product_attention_simple(q, k, v, attn_mask)
     assert torch.allclose(attn_torch, attn_rl4co)
+
+
+@pytest.mark.parametrize("num_kv_heads", [None, 1, 2, 4])
+def test_multi_head_cross_attention_kv_heads(num_kv_heads):
+    embed_dim, num_heads = 64, 4
+    head_dim = embed_dim // num_heads
+    mha = MultiHeadCrossAttention(embed_dim, num_heads, num_kv_heads=num_kv_heads)
+    # default keeps the standard multi-head parameter shapes
+    kv_heads = num_heads if num_kv_heads is None else num_kv_heads
+    assert mha.Wq.weight.shape == (embed_dim, embed_dim)
+    assert mha.Wkv.weight.shape == (2 * kv_heads * head_dim, embed_dim)
+    q_input, kv_input = torch.randn(2, 3, embed_dim), torch.randn(2, 5, embed_dim)
+    out = mha(q_input, kv_input)
+    assert out.shape == (2, 3, embed_dim)
+
+
+def test_multi_head_cross_attention_kv_heads_not_divisor():
+    with pytest.raises(AssertionError):
+        MultiHeadCrossAttention(64, 4, num_kv_heads=3)
+
+
+@pytest.mark.parametrize("sdpa_fn", [None, scaled_dot_product_attention_simple])
+def test_multi_head_attention_padded_heads(sdpa_fn):
+    # head_dim = 12 is not a multiple of 8, so heads are zero-padded internally
+    bs, ns, embed_dim, num_heads = 2, 7, 60, 5
+    # float64, so the comparison does not depend on the global float32 matmul precision
+    mha = MultiHeadAttention(embed_dim, num_heads, sdpa_fn=sdpa_fn, dtype=torch.float64)
+    assert mha.head_pad > 0
+    x = torch.randn(bs, ns, embed_dim, dtype=torch.float64)
+    attn_mask = torch.rand(bs, ns) > 0.3
+    attn_mask[:, 0] = True  # at least one key is attended
+    out = mha(x, attn_mask)
+
+    # reference: unpadded SDPA with the same projections
+    q, k, v = mha.Wqkv(x).view(bs, ns, 3, num_heads, -1).permute(2, 0, 3, 1, 4)
+    ref = scaled_dot_product_attention(q, k, v, attn_mask[:, None, None, :])
+    ref = mha.out_proj(ref.transpose(1, 2).reshape(bs, ns, embed_dim))
+    assert torch.allclose(out, ref, atol=1e-10)
+
+
+@pytest.mark.parametrize("dtype", [torch.float32, torch.bfloat16])
+def test_flash_attn_casts_to_half_precision(dtype, monkeypatch):
+    from rl4co.models.nn import flash_attention
+
+    # flash-attn is optional, so we mock the kernel and record the dtypes it receives
+    kernel_dtypes = []
+
+    def flash_attn_func(q, k, v, dropout_p=0.0, causal=False):
+        kernel_dtypes.append((q.dtype, k.dtype, v.dtype))
+        return q.clone()
+
+    monkeypatch.setattr(flash_attention, "_get_flash_attn_func", lambda: flash_attn_func)
+    warnings = []
+    monkeypatch.setattr(flash_attention.log, "warning", warnings.append)
+    flash_attention._warn_bfloat16_cast.cache_clear()
+
+    q, k, v = (torch.randn(2, 4, 5, 8, dtype=dtype) for _ in range(3))
+    for _ in range(2):
+        out = flash_attention.scaled_dot_product_attention_flash_attn(q, k, v)
+        assert out.dtype == dtype and out.shape == q.shape
+        assert torch.allclose(out, q, atol=1e-2)
+    assert kernel_dtypes == [(torch.bfloat16,) * 3] * 2
+    # the cast is reported only once
+    assert len(warnings) == (dtype != torch.bfloat16)